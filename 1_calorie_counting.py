@@ -1,27 +1,342 @@
-def calc_most_calories(calories):
-    most_calories = max(sum(elf_cals) for elf_cals in calories)
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappush, heapreplace
+from itertools import chain
+from random import random
+from typing import IO, Iterable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CALORIES_LOADER = 'stream'  # ('stream', 'numpy', 'parallel')
+
+NEWLINE = ord('\n')
+ZERO = ord('0')
+NINE = ord('9')
+CALORIES_BLOCK_SIZE = 4 * 1024 * 1024
+ELVES_SEPARATOR_PATT = re.compile(rb'\n\r?\n')
+IS_WHITESPACE_ARRAY = np.array([code < 128 and chr(code).isspace() for code in range(256)]) if np is not None else None
+
+
+def read_elves_calories(stream: IO):
+    elf_cals = 0
+    has_items = False
+    for line in stream:
+        line = line.strip()
+        if line.isdigit():
+            elf_cals += int(line)
+            has_items = True
+        elif has_items:
+            yield elf_cals
+            elf_cals = 0
+            has_items = False
+
+    if has_items:
+        yield elf_cals
+
+
+def load_elves_calories_array(path, block_size=CALORIES_BLOCK_SIZE):
+    size = os.path.getsize(path)
+    if not size:
+        return np.zeros(0, dtype=np.int64)
+
+    blocks = split_calories_file(path, -(-size // block_size))
+    elves_calories = []
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for start, end in blocks:
+                block = np.frombuffer(buffer, dtype=np.uint8, count=end - start, offset=start)
+                elves_calories.append(sum_elves_calories_array(block))
+                del block
+
+    return np.concatenate(elves_calories)
+
+
+def find_stripped_lines(data):
+    line_ends = np.flatnonzero(data == NEWLINE)
+    if not line_ends.size or line_ends[-1] != data.size - 1:
+        line_ends = np.append(line_ends, data.size)
+
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    line_sizes = line_ends - line_starts
+
+    lines = np.flatnonzero(line_sizes > 0)
+    while lines.size:
+        lines = lines[IS_WHITESPACE_ARRAY[data[line_starts[lines]]]]
+        line_starts[lines] += 1
+        line_sizes[lines] -= 1
+        lines = lines[line_sizes[lines] > 0]
+
+    lines = np.flatnonzero(line_sizes > 0)
+    while lines.size:
+        lines = lines[IS_WHITESPACE_ARRAY[data[line_starts[lines] + line_sizes[lines] - 1]]]
+        line_sizes[lines] -= 1
+        lines = lines[line_sizes[lines] > 0]
+
+    return line_starts, line_sizes
+
+
+def sum_elves_calories_array(data):
+    line_starts, line_sizes = find_stripped_lines(data)
+
+    numbers = np.zeros(line_starts.size, dtype=np.int64)
+    is_number = line_sizes > 0
+    for offset in range(int(line_sizes.max())):
+        lines = np.flatnonzero(line_sizes > offset)
+        digits = data[line_starts[lines] + offset] - ZERO
+        is_number[lines] &= digits <= NINE - ZERO
+        numbers[lines] = numbers[lines] * 10 + digits
+
+    number_lines = np.flatnonzero(is_number)
+    if not number_lines.size:
+        return np.zeros(0, dtype=np.int64)
+
+    group_starts = np.flatnonzero(np.diff(number_lines, prepend=-2) > 1)
+    return np.add.reduceat(numbers[number_lines], group_starts)
+
+
+def split_calories_file(path, chunks):
+    size = os.path.getsize(path)
+    if not size:
+        return []
+
+    bounds = [0]
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for idx in range(1, chunks):
+                pos = max(size * idx // chunks - 1, bounds[-1])
+                separator = ELVES_SEPARATOR_PATT.search(buffer, pos)
+                if not separator:
+                    break
+
+                if separator.end() > bounds[-1]:
+                    bounds.append(separator.end())
+
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def read_chunk_lines(file, start, end):
+    file.seek(start)
+    pos = start
+    while pos < end:
+        line = file.readline()
+        if not line:
+            break
+
+        pos += len(line)
+        yield line
+
+
+def calc_chunk_top_most_calories(path, start, end, top):
+    with open(path, 'rb') as file:
+        return calc_top_most_calories(read_elves_calories(read_chunk_lines(file, start, end)), top)
+
+
+def calc_top_most_calories_parallel(path, top=3, workers=None):
+    workers = workers or os.cpu_count()
+    chunks = split_calories_file(path, workers)
+    if not chunks:
+        return []
+
+    starts, ends = zip(*chunks)
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        chunks_top = executor.map(calc_chunk_top_most_calories,
+                                  [path] * len(chunks), starts, ends, [top] * len(chunks))
+
+        return calc_top_most_calories(chain.from_iterable(chunks_top), top)
+
+
+def is_calories_array(elves_calories):
+    return np is not None and isinstance(elves_calories, np.ndarray)
+
+
+def calc_most_calories(elves_calories: Iterable[int]):
+    if is_calories_array(elves_calories):
+        return int(elves_calories.max())
+
+    most_calories = max(elves_calories)
     return most_calories
 
 
-def calc_top_most_calories(calories, top=3):
-    most_calories_sorted = sorted((sum(elf_cals) for elf_cals in calories), reverse=True)
-    return most_calories_sorted[:top]
+def calc_top_most_calories(elves_calories: Iterable[int], top=3):
+    if top <= 0:
+        return []
 
+    if is_calories_array(elves_calories):
+        if not elves_calories.size:
+            return []
 
-if __name__ == '__main__':
-    calories = []
-    with open('inputs/1_calories.txt') as file:
-        elf_cals = []
-        for line in file.readlines():
-            line = line.strip()
-            if line.isdigit():
-                elf_cals.append(int(line))
+        kth = max(elves_calories.size - top, 0)
+        top_calories = np.partition(elves_calories, kth)[kth:]
+        return sorted(top_calories.tolist(), reverse=True)
+
+    top_calories = []
+    for cals in elves_calories:
+        if len(top_calories) < top:
+            heappush(top_calories, cals)
+        elif cals > top_calories[0]:
+            heapreplace(top_calories, cals)
+
+    return sorted(top_calories, reverse=True)
+
+
+class RankNode:
+
+    def __init__(self, key):
+        self.key = key
+        self.priority = random()
+        self.size = 1
+        self.left = None
+        self.right = None
+
+    def update_size(self):
+        self.size = 1 + RankTree.get_size(self.left) + RankTree.get_size(self.right)
+
+
+class RankTree:
+
+    def __init__(self):
+        self.root = None
+
+    def __len__(self):
+        return self.get_size(self.root)
+
+    def insert(self, key):
+        left, right = self.split(self.root, key)
+        self.root = self.merge(self.merge(left, RankNode(key)), right)
+
+    def remove(self, key):
+        self.root = self.erase(self.root, key)
+
+    def count_less(self, key):
+        count = 0
+        node = self.root
+        while node:
+            if node.key < key:
+                count += self.get_size(node.left) + 1
+                node = node.right
             else:
-                calories.append(elf_cals)
-                elf_cals = []
+                node = node.left
+
+        return count
+
+    def iter_first(self, count):
+        stack = []
+        node = self.root
+        while count and (stack or node):
+            while node:
+                stack.append(node)
+                node = node.left
+
+            node = stack.pop()
+            yield node.key
+            count -= 1
+            node = node.right
+
+    @staticmethod
+    def get_size(node):
+        return node.size if node else 0
+
+    @classmethod
+    def split(cls, node, key):
+        if node is None:
+            return None, None
+
+        if node.key < key:
+            node.right, right = cls.split(node.right, key)
+            node.update_size()
+            return node, right
+
+        left, node.left = cls.split(node.left, key)
+        node.update_size()
+        return left, node
+
+    @classmethod
+    def merge(cls, left, right):
+        if not left or not right:
+            return left or right
+
+        if left.priority > right.priority:
+            left.right = cls.merge(left.right, right)
+            left.update_size()
+            return left
+
+        right.left = cls.merge(left, right.left)
+        right.update_size()
+        return right
+
+    @classmethod
+    def erase(cls, node, key):
+        if node is None:
+            raise KeyError(key)
+
+        if node.key == key:
+            return cls.merge(node.left, node.right)
+
+        if key < node.key:
+            node.left = cls.erase(node.left, key)
+        else:
+            node.right = cls.erase(node.right, key)
+
+        node.update_size()
+        return node
+
+
+class CaloriesLeaderboard:
+
+    def __init__(self):
+        self.elves_calories = []
+        self.ranking = RankTree()
+
+    def __len__(self):
+        return len(self.elves_calories)
+
+    def add_elf(self, elf_cals: Iterable[int]):
+        elf = len(self.elves_calories)
+        calories = sum(elf_cals)
+        self.elves_calories.append(calories)
+        self.ranking.insert((-calories, elf))
+
+        return elf
+
+    def amend_elf(self, elf, elf_cals: Iterable[int]):
+        calories = sum(elf_cals)
+        self.ranking.remove((-self.elves_calories[elf], elf))
+        self.elves_calories[elf] = calories
+        self.ranking.insert((-calories, elf))
+
+    def get_elf_calories(self, elf):
+        return self.elves_calories[elf]
+
+    def get_elf_rank(self, elf):
+        return self.ranking.count_less((-self.elves_calories[elf], -1)) + 1
+
+    def get_top_elves(self, top=3):
+        return [(elf, -calories) for calories, elf in self.ranking.iter_first(top)]
+
+    def get_top_most_calories(self, top=3):
+        return [calories for _, calories in self.get_top_elves(top)]
+
+
+if __name__ == '__main__':
+    if CALORIES_LOADER == 'numpy':
+        elves_calories = load_elves_calories_array('inputs/1_calories.txt')
+        most_calories = calc_most_calories(elves_calories)
+        most_calories_top = calc_top_most_calories(elves_calories, top=3)
+    elif CALORIES_LOADER == 'parallel':
+        most_calories_top = calc_top_most_calories_parallel('inputs/1_calories.txt', top=3)
+        most_calories = calc_most_calories(most_calories_top)
+    else:
+        with open('inputs/1_calories.txt') as file:
+            most_calories_top = calc_top_most_calories(read_elves_calories(file), top=3)
+
+        most_calories = calc_most_calories(most_calories_top)
 
-    most_calories = calc_most_calories(calories)
-    most_calories_top = calc_top_most_calories(calories, top=3)
     print(f"Most calories number: {most_calories} Cal")
     for idx, cal in enumerate(most_calories_top):
         print(f"Top {idx + 1}: {cal} Cal")
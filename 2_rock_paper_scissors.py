@@ -1,3 +1,17 @@
+import mmap
+import os
+from collections import Counter
+from itertools import permutations
+from typing import IO
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SCORING_MODE = 'strided'  # ('per_round', 'histogram', 'strided')
+ROUND_STRIDE = len(b'A X\n')
+
 # TRUE VERSION
 OPPONENT_ROCK = ROCK = 'A'
 OPPONENT_PAPER = PAPER = 'B'
@@ -49,6 +63,17 @@ SHAPE_BEATING_SCORE_SCHEMA_TRUE_VERSION = {
     (OPPONENT_SCISSORS, MEANS_LOSE): PAPER_POINTS + LOSE_POINTS,
 }
 
+OPPONENT_COLUMN = (OPPONENT_ROCK, OPPONENT_PAPER, OPPONENT_SCISSORS)
+PLAYER_COLUMN = (PLAYER_ROCK, PLAYER_PAPER, PLAYER_SCISSORS)
+
+SHAPE_POINTS = {ROCK: ROCK_POINTS, PAPER: PAPER_POINTS, SCISSORS: SCISSORS_POINTS}
+SHAPE_BEATS = {ROCK: SCISSORS, PAPER: ROCK, SCISSORS: PAPER}
+
+SCORE_SCHEMAS = dict(
+    player_version=SHAPE_BEATING_SCORE_SCHEMA_PLAYER_VERSION,
+    true_version=SHAPE_BEATING_SCORE_SCHEMA_TRUE_VERSION
+)
+
 
 def play_player_version_round(opponent_shape, player_shape):
     score = SHAPE_BEATING_SCORE_SCHEMA_PLAYER_VERSION[(opponent_shape, player_shape)]
@@ -60,18 +85,129 @@ def play_normal_round(opponent_shape, player_action):
     return score
 
 
+def register_score_schema(name, schema):
+    SCORE_SCHEMAS[name] = schema
+
+
+def play_shapes_outcome(opponent_shape, player_shape):
+    if opponent_shape == player_shape:
+        return DRAW_POINTS
+
+    return WIN_POINTS if SHAPE_BEATS[player_shape] == opponent_shape else LOSE_POINTS
+
+
+def build_column_mapping_schema(column_to_shape):
+    return {
+        (opponent_shape, column): SHAPE_POINTS[shape] + play_shapes_outcome(opponent_shape, shape)
+        for opponent_shape in OPPONENT_COLUMN
+        for column, shape in column_to_shape.items()
+    }
+
+
+def build_decryption_schemas():
+    schemas = dict()
+    for shapes in permutations(OPPONENT_COLUMN):
+        column_to_shape = dict(zip(PLAYER_COLUMN, shapes))
+        name = ','.join(f'{column}={shape}' for column, shape in column_to_shape.items())
+        schemas[name] = build_column_mapping_schema(column_to_shape)
+
+    schemas['outcome'] = SHAPE_BEATING_SCORE_SCHEMA_TRUE_VERSION
+    return schemas
+
+
+def find_best_decryption(rounds_count):
+    scores = score_schemas(rounds_count, build_decryption_schemas())
+    best = max(scores, key=scores.get)
+
+    return best, scores
+
+
+def count_rounds(stream: IO[bytes]):
+    lines_count = Counter(stream)
+    rounds_count = Counter()
+    for line, count in lines_count.items():
+        round_ = tuple(line.decode().split())
+        if round_:
+            rounds_count[round_] += count
+
+    return rounds_count
+
+
+def count_rounds_strided(path):
+    size = os.path.getsize(path)
+    tail_size = size % ROUND_STRIDE
+    if np is None or size < ROUND_STRIDE or tail_size not in (0, ROUND_STRIDE - 1):
+        with open(path, 'rb') as file:
+            return count_rounds(file)
+
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            rounds_count = count_strided_rows(buffer, size - tail_size)
+            tail = buffer[size - tail_size:]
+
+    if rounds_count is None:
+        with open(path, 'rb') as file:
+            return count_rounds(file)
+
+    rounds_count.update(count_rounds([tail]))
+    return rounds_count
+
+
+def count_strided_rows(buffer, size):
+    rows = np.frombuffer(buffer, dtype=np.uint8, count=size).reshape(-1, ROUND_STRIDE)
+    opponents = rows[:, 0] - ord(OPPONENT_ROCK)
+    players = rows[:, 2] - ord(PLAYER_ROCK)
+    is_strided = (opponents < 3) & (rows[:, 1] == ord(' ')) & (players < 3) & (rows[:, 3] == ord('\n'))
+    if not is_strided.all():
+        return None
+
+    kinds_count = np.bincount(opponents * 3 + players, minlength=9).reshape(3, 3)
+    return Counter({
+        (opponent, player): int(kinds_count[o_idx, p_idx])
+        for o_idx, opponent in enumerate(OPPONENT_COLUMN)
+        for p_idx, player in enumerate(PLAYER_COLUMN)
+    })
+
+
+def score_rounds(rounds_count, schema):
+    return sum(schema[round_] * count for round_, count in rounds_count.items())
+
+
+def score_schemas(rounds_count, schemas=None):
+    schemas = SCORE_SCHEMAS if schemas is None else schemas
+    return {name: score_rounds(rounds_count, schema) for name, schema in schemas.items()}
+
+
 if __name__ == '__main__':
     player_version_score = 0
     player_actual_score = 0
-    with open('inputs/2_rock_paper_scissors.txt') as file:
-        for line in file.readlines():
-            round_ = line.strip()
-            player_version_score += play_player_version_round(*round_.split())
-            player_actual_score += play_normal_round(*round_.split())
+    if SCORING_MODE in ('histogram', 'strided'):
+        if SCORING_MODE == 'strided':
+            rounds_count = count_rounds_strided('inputs/2_rock_paper_scissors.txt')
+        else:
+            with open('inputs/2_rock_paper_scissors.txt', 'rb') as file:
+                rounds_count = count_rounds(file)
+
+        scores = score_schemas(rounds_count)
+        player_version_score = scores['player_version']
+        player_actual_score = scores['true_version']
+    else:
+        with open('inputs/2_rock_paper_scissors.txt') as file:
+            for line in file:
+                round_ = line.strip()
+                player_version_score += play_player_version_round(*round_.split())
+                player_actual_score += play_normal_round(*round_.split())
 
     print(f"Player version score is {player_version_score} points")
     print(f"Player actual score is {player_actual_score} points")
 
+    if SCORING_MODE != 'per_round':
+        best_decryption, decryption_scores = find_best_decryption(rounds_count)
+        for decryption, score in decryption_scores.items():
+            print(f"Decryption {decryption} scores {score} points")
+
+        print(f"The most likely decryption is {best_decryption}")
+
 
 '''
 --- Day 2: Rock Paper Scissors ---
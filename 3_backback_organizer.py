@@ -1,19 +1,209 @@
-def find_disordered_items(backpack):
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from itertools import islice
+from operator import and_, or_
+from string import ascii_letters
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ITEMS_ENGINE = 'loop'  # ('loop', 'numpy', 'parallel')
+GROUP_SIZE = 3
+CHUNK_GROUPS = 10000
+BACKPACKS_BLOCK_SIZE = 4 * 1024 * 1024
+
+ITEM_TYPES = ascii_letters
+ITEM_BITS = [0] * 256
+for priority, item_type in enumerate(ITEM_TYPES, start=1):
+    ITEM_BITS[ord(item_type)] = 1 << (priority - 1)
+
+ITEM_BITS_ARRAY = np.array(ITEM_BITS, dtype=np.uint64) if np is not None else None
+IS_WHITESPACE_ARRAY = np.array([code < 128 and chr(code).isspace() for code in range(256)]) if np is not None else None
+
+
+def encode_items(items: str):
+    return reduce(or_, map(ITEM_BITS.__getitem__, items.encode()), 0)
+
+
+def decode_items(mask: int):
+    items = []
+    while mask:
+        lowest = mask & -mask
+        items.append(ITEM_TYPES[lowest.bit_length() - 1])
+        mask ^= lowest
+
+    return items
+
+
+def get_items_priority_sum(mask: int):
+    priority_sum = 0
+    while mask:
+        lowest = mask & -mask
+        priority_sum += lowest.bit_length()
+        mask ^= lowest
+
+    return priority_sum
+
+
+def find_disordered_items_mask(backpack):
     backpack_size = len(backpack)
     compartment1, compartment2 = backpack[backpack_size//2:], backpack[:backpack_size//2]
 
-    return list(set(compartment1).intersection(compartment2))
+    return encode_items(compartment1) & encode_items(compartment2)
+
+
+def find_disordered_items(backpack):
+    return decode_items(find_disordered_items_mask(backpack))
 
 
 def get_item_priority(item: str):
-    if item.islower(): return ord(item) - 96
-    if item.isupper(): return ord(item) - 38
+    return ITEM_BITS[ord(item)].bit_length()
+
+
+def find_group_badge_mask(group):
+    return reduce(and_, map(encode_items, group))
 
 
 def find_group_badge(group):
-    elf1_backpack, elf2_backpack, elf3_backpack = group
+    badges = decode_items(find_group_badge_mask(group))
+
+    return badges.pop() if badges else None
+
+
+def read_backpack_chunks(stream, groups_count=1):
+    backpacks = filter(None, (line.strip() for line in stream))
+    chunk = list(islice(backpacks, GROUP_SIZE * groups_count))
+    while chunk:
+        yield chunk
+        chunk = list(islice(backpacks, GROUP_SIZE * groups_count))
+
+
+def sum_backpacks_priorities(backpacks):
+    items_priority_sum = sum(get_items_priority_sum(find_disordered_items_mask(backpack)) for backpack in backpacks)
+    badges_priority_sum = sum(
+        get_items_priority_sum(find_group_badge_mask(backpacks[idx:idx + GROUP_SIZE]))
+        for idx in range(0, len(backpacks) - GROUP_SIZE + 1, GROUP_SIZE)
+    )
+
+    return items_priority_sum, badges_priority_sum
+
+
+def sum_backpacks_priorities_parallel(path, groups_count=CHUNK_GROUPS, workers=None):
+    workers = workers or os.cpu_count()
+    items_priority_sum = badges_priority_sum = 0
+    with open(path) as file, ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in read_backpack_chunks(file, groups_count):
+            pending.append(executor.submit(sum_backpacks_priorities, chunk))
+            if len(pending) < workers * 2:
+                continue
+
+            items_priority, badges_priority = pending.popleft().result()
+            items_priority_sum += items_priority
+            badges_priority_sum += badges_priority
 
-    return set(elf1_backpack).intersection(elf2_backpack, elf3_backpack).pop()
+        for future in pending:
+            items_priority, badges_priority = future.result()
+            items_priority_sum += items_priority
+            badges_priority_sum += badges_priority
+
+    return items_priority_sum, badges_priority_sum
+
+
+def load_backpack_masks(path, block_size=BACKPACKS_BLOCK_SIZE):
+    size = os.path.getsize(path)
+    if not size:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64)
+
+    backpacks = []
+    disordered = []
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            start = 0
+            while start < size:
+                end = buffer.find(b'\n', min(start + block_size, size) - 1) + 1 or size
+                block = np.frombuffer(buffer, dtype=np.uint8, count=end - start, offset=start)
+                block_backpacks, block_disordered = encode_backpacks(block)
+                del block
+
+                backpacks.append(block_backpacks)
+                disordered.append(block_disordered)
+                start = end
+
+    return np.concatenate(backpacks), np.concatenate(disordered)
+
+
+def find_stripped_lines(data):
+    line_ends = np.flatnonzero(data == ord('\n'))
+    if not line_ends.size or line_ends[-1] != data.size - 1:
+        line_ends = np.append(line_ends, data.size)
+
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    line_sizes = line_ends - line_starts
+
+    lines = np.flatnonzero(line_sizes > 0)
+    while lines.size:
+        lines = lines[IS_WHITESPACE_ARRAY[data[line_starts[lines]]]]
+        line_starts[lines] += 1
+        line_sizes[lines] -= 1
+        lines = lines[line_sizes[lines] > 0]
+
+    lines = np.flatnonzero(line_sizes > 0)
+    while lines.size:
+        lines = lines[IS_WHITESPACE_ARRAY[data[line_starts[lines] + line_sizes[lines] - 1]]]
+        line_sizes[lines] -= 1
+        lines = lines[line_sizes[lines] > 0]
+
+    not_blank = line_sizes > 0
+    return line_starts[not_blank], line_sizes[not_blank]
+
+
+def encode_backpacks(data):
+    line_starts, line_sizes = find_stripped_lines(data)
+    half_sizes = line_sizes // 2
+
+    first_halves = np.zeros(line_starts.size, dtype=np.uint64)
+    second_halves = np.zeros(line_starts.size, dtype=np.uint64)
+    for offset in range(int(line_sizes.max(initial=0))):
+        lines = np.flatnonzero(line_sizes > offset)
+        bits = ITEM_BITS_ARRAY[data[line_starts[lines] + offset]]
+        in_first_half = offset < half_sizes[lines]
+        first_halves[lines[in_first_half]] |= bits[in_first_half]
+        second_halves[lines[~in_first_half]] |= bits[~in_first_half]
+
+    return first_halves | second_halves, first_halves & second_halves
+
+
+def find_group_badge_masks(backpacks):
+    groups_count = backpacks.size // GROUP_SIZE
+    groups = backpacks[:groups_count * GROUP_SIZE].reshape(-1, GROUP_SIZE)
+
+    return np.bitwise_and.reduce(groups, axis=1)
+
+
+def get_masks_priority_sum(masks):
+    priority_sum = 0
+    for bit in range(len(ITEM_TYPES)):
+        priority_sum += int(np.count_nonzero((masks >> np.uint64(bit)) & np.uint64(1))) * (bit + 1)
+
+    return priority_sum
+
+
+def decode_item_masks(masks):
+    rows = []
+    item_types = []
+    for bit, item_type in enumerate(ITEM_TYPES):
+        found = np.flatnonzero((masks >> np.uint64(bit)) & np.uint64(1))
+        rows.append(found)
+        item_types.append(np.full(found.size, bit))
+
+    order = np.argsort(np.concatenate(rows), kind='stable')
+    return [ITEM_TYPES[bit] for bit in np.concatenate(item_types)[order].tolist()]
 
 
 if __name__ == '__main__':
@@ -21,25 +211,35 @@ if __name__ == '__main__':
     disordered_items = []
     badges_priority = 0
     item_priority_sum = 0
-    elf_group = []
-    with open('inputs/3_backpacks.txt') as file:
-        for line in file.readlines():
-            backpack = line.strip()
-            elf_group.append(backpack)
-            if len(elf_group) == 3:
-                badge = find_group_badge(elf_group)
-                if badge:
-                    group_badges.append(badge)
-                    badges_priority += get_item_priority(badge)
-                    elf_group = []
-
-            found = find_disordered_items(backpack)
-            if found:
-                disordered_items.extend(found)
-                item_priority_sum += sum(get_item_priority(item) for item in found)
-
-    print(f'Group barges: {group_badges}')
-    print(f'Disordered items: {disordered_items}')
+    if ITEMS_ENGINE == 'numpy':
+        backpack_masks, disordered_masks = load_backpack_masks('inputs/3_backpacks.txt')
+        badge_masks = find_group_badge_masks(backpack_masks)
+
+        group_badges = decode_item_masks(badge_masks)
+        disordered_items = decode_item_masks(disordered_masks)
+        badges_priority = get_masks_priority_sum(badge_masks)
+        item_priority_sum = get_masks_priority_sum(disordered_masks)
+    elif ITEMS_ENGINE == 'parallel':
+        item_priority_sum, badges_priority = sum_backpacks_priorities_parallel('inputs/3_backpacks.txt')
+    else:
+        with open('inputs/3_backpacks.txt') as file:
+            for elf_group in read_backpack_chunks(file):
+                if len(elf_group) == GROUP_SIZE:
+                    badge = find_group_badge(elf_group)
+                    if badge:
+                        group_badges.append(badge)
+                        badges_priority += get_item_priority(badge)
+
+                for backpack in elf_group:
+                    found_mask = find_disordered_items_mask(backpack)
+                    if found_mask:
+                        disordered_items.extend(decode_items(found_mask))
+                        item_priority_sum += get_items_priority_sum(found_mask)
+
+    if ITEMS_ENGINE != 'parallel':
+        print(f'Group barges: {group_badges}')
+        print(f'Disordered items: {disordered_items}')
+
     print(f'Badges priority sum is {badges_priority}')
     print(f'Items priority sum is {item_priority_sum}')
 
@@ -1,36 +1,274 @@
-def are_ranges_overlap(range1: range, range2: range):
-    return bool(set(range1).intersection(range2))
+import mmap
+import os
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate
+from typing import Iterable
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-def are_ranges_fully_overlap(range1: range, range2: range):
-    greater, smaller = (range1, range2) if len(range1) > len(range2) else (range2, range1)
-    return set(smaller).issubset(greater)
+SECTIONS_ENGINE = 'loop'  # ('loop', 'numpy')
+PAIR_BOUNDS = 4
+SECTIONS_BLOCK_SIZE = 4 * 1024 * 1024
+CLEANED_BY_MORE_THAN = 2
+COVERAGE_REPORT = False
+
+
+class Interval:
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f'{self.start}-{self.end}'
+
+    def __len__(self):
+        return self.end - self.start + 1
+
+    def contains(self, other):
+        return self.start <= other.start and other.end <= self.end
+
+    def overlaps(self, other):
+        return self.start <= other.end and other.start <= self.end
+
+
+def are_ranges_overlap(range1: Interval, range2: Interval):
+    return range1.overlaps(range2)
+
+
+def are_ranges_fully_overlap(range1: Interval, range2: Interval):
+    return range1.contains(range2) or range2.contains(range1)
 
 
 def parse_ranges_pair(line):
     ranges = []
     for range_ in line.strip().split(','):
         start, end = map(int, range_.split('-'))
-        ranges.append(range(start, end + 1))
+        ranges.append(Interval(start, end))
 
     return ranges
 
 
+class SectionsCoverageIndex:
+
+    def __init__(self, assignments: Iterable[Interval]):
+        self.assignments = sorted(assignments, key=lambda a: (a.start, a.end))
+        self.starts = [a.start for a in self.assignments]
+        self.max_ends = [a.end for a in self.assignments]
+        self.__build_max_ends(0, len(self.assignments))
+
+        events = Counter()
+        for assignment in self.assignments:
+            events[assignment.start] += 1
+            events[assignment.end + 1] -= 1
+
+        self.bounds = sorted(events)
+        self.coverage = list(accumulate(events[bound] for bound in self.bounds))
+        self.covered_before = [0] + list(accumulate(
+            self.bounds[idx + 1] - self.bounds[idx] if self.coverage[idx] else 0
+            for idx in range(len(self.bounds) - 1)
+        ))
+
+        self.segments_by_coverage = sorted(range(len(self.bounds) - 1), key=lambda idx: -self.coverage[idx])
+        self.coverage_desc = [-self.coverage[idx] for idx in self.segments_by_coverage]
+
+    def __build_max_ends(self, lo, hi):
+        if lo >= hi:
+            return None
+
+        mid = (lo + hi) // 2
+        for child in (self.__build_max_ends(lo, mid), self.__build_max_ends(mid + 1, hi)):
+            if child is not None and child > self.max_ends[mid]:
+                self.max_ends[mid] = child
+
+        return self.max_ends[mid]
+
+    def find_overlapping(self, query: Interval):
+        found = []
+        stack = [(0, len(self.assignments))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+
+            mid = (lo + hi) // 2
+            if self.max_ends[mid] < query.start:
+                continue
+
+            stack.append((lo, mid))
+            if self.starts[mid] <= query.end:
+                if self.assignments[mid].overlaps(query):
+                    found.append(self.assignments[mid])
+
+                stack.append((mid + 1, hi))
+
+        return sorted(found, key=lambda a: (a.start, a.end))
+
+    def find_sections_cleaned_more_than(self, times):
+        segments = sorted(self.segments_by_coverage[:bisect_left(self.coverage_desc, -times)])
+
+        sections = []
+        for idx in segments:
+            start, end = self.bounds[idx], self.bounds[idx + 1] - 1
+            if sections and sections[-1].end + 1 == start:
+                sections[-1].end = end
+            else:
+                sections.append(Interval(start, end))
+
+        return sections
+
+    def count_covered_before(self, section):
+        idx = bisect_right(self.bounds, section) - 1
+        if idx < 0:
+            return 0
+
+        if idx == len(self.bounds) - 1:
+            return self.covered_before[idx]
+
+        partial = section - self.bounds[idx] if self.coverage[idx] else 0
+        return self.covered_before[idx] + partial
+
+    def get_uncovered_span(self, start=None, end=None):
+        if not self.assignments:
+            return 0 if start is None or end is None else end - start + 1
+
+        start = self.bounds[0] if start is None else start
+        end = self.bounds[-1] - 1 if end is None else end
+        covered = self.count_covered_before(end + 1) - self.count_covered_before(start)
+
+        return end - start + 1 - covered
+
+
+def load_ranges_columns(path, block_size=SECTIONS_BLOCK_SIZE):
+    size = os.path.getsize(path)
+    if not size:
+        return tuple(np.zeros(0, dtype=np.int64) for _ in range(PAIR_BOUNDS))
+
+    blocks_numbers = []
+    lines_before = 0
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            start = 0
+            while start < size:
+                end = buffer.find(b'\n', min(start + block_size, size) - 1) + 1 or size
+                block = np.frombuffer(buffer, dtype=np.uint8, count=end - start, offset=start)
+                block_numbers, numbers_per_line = parse_numbers_array(block)
+                del block
+
+                bad_lines = np.flatnonzero(numbers_per_line != PAIR_BOUNDS)
+                if bad_lines.size:
+                    line = bad_lines[0]
+                    raise ValueError(f'Expected {PAIR_BOUNDS} section bounds on line {lines_before + line + 1}, '
+                                     f'got {numbers_per_line[line]}')
+
+                blocks_numbers.append(block_numbers)
+                lines_before += numbers_per_line.size
+                start = end
+
+    numbers = np.concatenate(blocks_numbers)
+    return tuple(numbers.reshape(-1, PAIR_BOUNDS).T)
+
+
+def parse_numbers_array(data):
+    is_digit = (data >= ord('0')) & (data <= ord('9'))
+    bound_flags = np.empty(data.size + 1, dtype=bool)
+    bound_flags[0] = is_digit[0] if data.size else False
+    bound_flags[-1] = is_digit[-1] if data.size else False
+    np.not_equal(is_digit[1:], is_digit[:-1], out=bound_flags[1:-1])
+    del is_digit
+
+    number_bounds = np.flatnonzero(bound_flags).reshape(-1, 2)
+    del bound_flags
+
+    line_ends = np.flatnonzero(data == ord('\n'))
+    lines_count = line_ends.size + (not data.size or data[-1] != ord('\n'))
+
+    number_starts = number_bounds[:, 0]
+    numbers_per_line = np.bincount(np.searchsorted(line_ends, number_starts), minlength=lines_count)
+    number_sizes = number_bounds[:, 1] - number_starts
+    numbers = np.zeros(number_starts.size, dtype=np.int64)
+    for offset in range(int(number_sizes.max(initial=0))):
+        active = np.flatnonzero(number_sizes > offset)
+        numbers[active] = numbers[active] * 10 + (data[number_starts[active] + offset] - ord('0'))
+
+    return numbers, numbers_per_line
+
+
+def count_ranges_overlaps_columnar(start1, end1, start2, end2):
+    fully_overlap = ((start1 <= start2) & (end2 <= end1)) | ((start2 <= start1) & (end1 <= end2))
+    overlap = (start1 <= end2) & (start2 <= end1)
+
+    ranges_full_overlap_count = int(np.count_nonzero(fully_overlap))
+    ranges_overlap_count = int(np.count_nonzero(overlap & ~fully_overlap))
+
+    return ranges_overlap_count, ranges_full_overlap_count
+
+
+def summarize_coverage_columnar(starts, ends, times):
+    if not starts.size:
+        return 0, 0
+
+    positions = np.concatenate((starts, ends + 1))
+    order = np.argsort(positions, kind='stable')
+    deltas = np.where(order < starts.size, 1, -1)
+    positions = positions[order]
+    del order
+
+    coverage = np.cumsum(deltas)
+    del deltas
+
+    last_events = np.flatnonzero(np.append(positions[1:] != positions[:-1], True))
+    bounds = positions[last_events]
+    coverage = coverage[last_events][:-1]
+    segment_sizes = np.diff(bounds)
+
+    crowded_span = int(segment_sizes[coverage > times].sum())
+    uncovered_span = int(segment_sizes[coverage == 0].sum())
+
+    return crowded_span, uncovered_span
+
+
 if __name__ == '__main__':
     ranges_overlap_count = 0
     ranges_full_overlap_count = 0
-    with open('inputs/4_cleaning_sections.txt') as file:
-        for line in file.readlines():
-            ranges = parse_ranges_pair(line)
-            if are_ranges_fully_overlap(*ranges):
-                ranges_full_overlap_count += 1
-            elif are_ranges_overlap(*ranges):
-                ranges_overlap_count += 1
+    assignments = []
+    if SECTIONS_ENGINE == 'numpy':
+        start1, end1, start2, end2 = load_ranges_columns('inputs/4_cleaning_sections.txt')
+        ranges_overlap_count, ranges_full_overlap_count = count_ranges_overlaps_columnar(start1, end1, start2, end2)
+    else:
+        with open('inputs/4_cleaning_sections.txt') as file:
+            for line in file:
+                ranges = parse_ranges_pair(line)
+                if COVERAGE_REPORT:
+                    assignments.extend(ranges)
+
+                if are_ranges_fully_overlap(*ranges):
+                    ranges_full_overlap_count += 1
+                elif are_ranges_overlap(*ranges):
+                    ranges_overlap_count += 1
 
     print(f"Overlapping sections meet {ranges_overlap_count} times")
     print(f"Fully overlapping sections meet {ranges_full_overlap_count} times")
     print(f"Totally overlapping sections meet {ranges_full_overlap_count + ranges_overlap_count} times")
 
+    if COVERAGE_REPORT:
+        if SECTIONS_ENGINE == 'numpy':
+            crowded_span, uncovered_span = summarize_coverage_columnar(
+                np.concatenate((start1, start2)), np.concatenate((end1, end2)), CLEANED_BY_MORE_THAN
+            )
+        else:
+            coverage_index = SectionsCoverageIndex(assignments)
+            crowded_span = sum(map(len, coverage_index.find_sections_cleaned_more_than(CLEANED_BY_MORE_THAN)))
+            uncovered_span = coverage_index.get_uncovered_span()
+
+        print(f"Sections cleaned by more than {CLEANED_BY_MORE_THAN} elves: {crowded_span}")
+        print(f"Uncovered sections span is {uncovered_span}")
+
 
 '''
 --- Day 4: Camp Cleanup ---
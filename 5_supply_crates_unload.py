@@ -1,95 +1,314 @@
 import re
-from typing import List
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from random import random
+from typing import IO, List
 
 STACK_CRATES_PATT = re.compile(r'([A-Z]|\s{3})\s?')
 COMMAND_PATT = re.compile(r'move\s+(\d+)\s+from\s+(\d+)\s+to\s+(\d+)')
-
-
-def complete_rearrange_command(cmd):
-    quantity, from_, to = map(int, COMMAND_PATT.search(cmd).groups())
-    source_stack = stacks[from_ - 1]
-    dest_stack = stacks[to - 1]
-
-    move_crates = CRANE_FUNCTIONAL[crane_type]
-    move_crates(quantity,
-                source_stack,
-                dest_stack)
+DEFAULT_CRANE_TYPE = 'CrateMover9001'
+RENDER_STEPS = False
+
+
+class CrateNode:
+
+    def __init__(self, crate):
+        self.crate = crate
+        self.priority = random()
+        self.size = 1
+        self.reversed = False
+        self.left = None
+        self.right = None
+
+    def push_reverse(self):
+        if self.reversed:
+            self.left, self.right = self.right, self.left
+            for child in (self.left, self.right):
+                if child:
+                    child.reversed = not child.reversed
+
+            self.reversed = False
+
+    def update_size(self):
+        self.size = 1 + CrateRope.get_size(self.left) + CrateRope.get_size(self.right)
+
+
+class CrateRope:
+
+    def __init__(self, crates=(), root=None):
+        self.root = root
+        for crate in crates:
+            self.append(crate)
+
+    def __len__(self):
+        return self.get_size(self.root)
+
+    def __getitem__(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+
+        if not 0 <= index < size:
+            raise IndexError('crate index out of range')
+
+        node = self.root
+        while True:
+            node.push_reverse()
+            left_size = self.get_size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node.crate
+            else:
+                index -= left_size + 1
+                node = node.right
+
+    def __iter__(self):
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                node.push_reverse()
+                stack.append(node)
+                node = node.left
+
+            node = stack.pop()
+            yield node.crate
+            node = node.right
+
+    def append(self, crate):
+        self.root = self.merge(self.root, CrateNode(crate))
+
+    def reverse(self):
+        if self.root:
+            self.root.reversed = not self.root.reversed
+
+    def cut_top(self, quantity):
+        self.root, top = self.split(self.root, max(len(self) - quantity, 0))
+        return CrateRope(root=top)
+
+    def put_on_top(self, crates):
+        self.root = self.merge(self.root, crates.root)
+        crates.root = None
+
+    @staticmethod
+    def get_size(node):
+        return node.size if node else 0
+
+    @classmethod
+    def split(cls, node, count):
+        if node is None:
+            return None, None
+
+        node.push_reverse()
+        left_size = cls.get_size(node.left)
+        if count <= left_size:
+            left, node.left = cls.split(node.left, count)
+            node.update_size()
+            return left, node
+
+        node.right, right = cls.split(node.right, count - left_size - 1)
+        node.update_size()
+        return node, right
+
+    @classmethod
+    def merge(cls, left, right):
+        if not left or not right:
+            return left or right
+
+        if left.priority > right.priority:
+            left.push_reverse()
+            left.right = cls.merge(left.right, right)
+            left.update_size()
+            return left
+
+        right.push_reverse()
+        right.left = cls.merge(left, right.left)
+        right.update_size()
+        return right
 
 
 def move_crates_one_at_time(quantity: int, source: List, dest: List):
-    while quantity:
-        crate = source.pop(0)
-        dest.insert(0, crate)
-        quantity -= 1
+    if quantity == 1 and source:
+        dest.append(source.pop())
+        return
+
+    split = max(len(source) - quantity, 0)
+    dest.extend(reversed(source[split:]))
+    del source[split:]
 
 
 def move_crates_multiply_at_time(quantity: int, source: List, dest: List):
-    crates = source[:quantity]
-    del source[:quantity]
-    dest[:0] = crates
+    split = max(len(source) - quantity, 0)
+    dest.extend(source[split:])
+    del source[split:]
+
 
+def move_rope_crates_one_at_time(quantity: int, source: CrateRope, dest: CrateRope):
+    crates = source.cut_top(quantity)
+    crates.reverse()
+    dest.put_on_top(crates)
 
-def parse_crates(line):
-    crates = STACK_CRATES_PATT.findall(line.strip('\n'))
-    if len(stacks) == 0:
-        stacks.extend([[] for _ in range(len(crates))])
 
-    for idx, crate in enumerate(crates):
-        if not crate.isspace():
-            stacks[idx].append(crate)
+def move_rope_crates_multiply_at_time(quantity: int, source: CrateRope, dest: CrateRope):
+    dest.put_on_top(source.cut_top(quantity))
 
 
-def get_top_crates():
-    top_crates = []
-    for stack in stacks:
-        top_crates.append(stack[0])
+CRANE_FUNCTIONAL = dict(
+    CrateMover9000=move_crates_one_at_time,
+    CrateMover9001=move_crates_multiply_at_time,
+    CrateMover9000Rope=move_rope_crates_one_at_time,
+    CrateMover9001Rope=move_rope_crates_multiply_at_time
+)
+CRANE_STACK_TYPE = dict(
+    CrateMover9000=list,
+    CrateMover9001=list,
+    CrateMover9000Rope=CrateRope,
+    CrateMover9001Rope=CrateRope
+)
 
-    return top_crates
+class CrateYard:
 
+    def __init__(self, crane_type=DEFAULT_CRANE_TYPE, snapshot_interval=None):
+        self.crane_type = crane_type
+        self.stacks: List[List[str]] = []
 
-def print_stacks():
-    rows = []
-    space = '   '
-    level = 1
-    top_level = max(len(stack) for stack in stacks)
-    while level <= top_level:
-        row = ' '.join(
-            f'[{stack[level * -1]}]' if len(stack) >= level else space
-            for stack in stacks
-        )
-        rows.insert(0, row)
-        level += 1
+        self.snapshot_interval = snapshot_interval
+        self.snapshots = []
+        self.commands = array('I')
 
-    print(*rows, sep='\n')
-    print(' '.join(
-        str(number).center(3, ' ') for number in range(1, len(stacks) + 1)
+    def read_stacks(self, stream: IO):
+        line = stream.readline()
+        while STACK_CRATES_PATT.search(line):
+            self.parse_crates(line)
+            line = stream.readline()
+
+        self.complete_crates_parsing()
+
+    def parse_crates(self, line):
+        crates = STACK_CRATES_PATT.findall(line.strip('\n'))
+        if len(self.stacks) == 0:
+            self.stacks.extend([[] for _ in range(len(crates))])
+
+        for idx, crate in enumerate(crates):
+            if not crate.isspace():
+                self.stacks[idx].append(crate)
+
+    def complete_crates_parsing(self):
+        make_stack = CRANE_STACK_TYPE[self.crane_type]
+        for idx, stack in enumerate(self.stacks):
+            self.stacks[idx] = make_stack(reversed(stack))
+
+    def rearrange(self, instructions: str, render=False):
+        self.run_commands(compile_commands(instructions), render)
+
+    def run_commands(self, commands: array, render=False):
+        stacks = self.stacks
+        move_crates = CRANE_FUNCTIONAL[self.crane_type]
+        snapshot_interval = self.snapshot_interval
+        if snapshot_interval:
+            self.commands = commands
+            self.snapshots = [self.take_snapshot()]
+
+        numbers = iter(commands)
+        for step, (quantity, from_, to) in enumerate(zip(numbers, numbers, numbers), start=1):
+            move_crates(quantity,
+                        stacks[from_ - 1],
+                        stacks[to - 1])
+
+            if snapshot_interval and step % snapshot_interval == 0:
+                self.snapshots.append(self.take_snapshot())
+
+            if render:
+                self.print_stacks()
+                print(f'move {quantity} from {from_} to {to}\n')
+
+    def take_snapshot(self):
+        return tuple(''.join(stack) for stack in self.stacks)
+
+    def restore_snapshot(self, snapshot):
+        make_stack = CRANE_STACK_TYPE[self.crane_type]
+        self.stacks = [make_stack(stack) for stack in snapshot]
+
+    def state_at(self, step):
+        if not self.snapshots:
+            raise ValueError('Commands were not run with a snapshot interval')
+
+        if not 0 <= step <= len(self.commands) // 3:
+            raise IndexError(f'Step {step} is out of the commands range')
+
+        snapshot_idx = min(step // self.snapshot_interval, len(self.snapshots) - 1)
+        replay_from = snapshot_idx * self.snapshot_interval
+
+        yard = CrateYard(self.crane_type)
+        yard.restore_snapshot(self.snapshots[snapshot_idx])
+        yard.run_commands(self.commands[replay_from * 3:step * 3])
+
+        return yard
+
+    def get_top_crates(self):
+        top_crates = []
+        for stack in self.stacks:
+            top_crates.append(stack[-1])
+
+        return top_crates
+
+    def print_stacks(self):
+        rows = []
+        space = '   '
+        level = 1
+        top_level = max(len(stack) for stack in self.stacks)
+        while level <= top_level:
+            row = ' '.join(
+                f'[{stack[level - 1]}]' if len(stack) >= level else space
+                for stack in self.stacks
+            )
+            rows.insert(0, row)
+            level += 1
+
+        print(*rows, sep='\n')
+        print(' '.join(
+            str(number).center(3, ' ') for number in range(1, len(self.stacks) + 1)
+        ))
+
+
+def compile_commands(instructions: str):
+    return array('I', (
+        int(number)
+        for cmd in COMMAND_PATT.finditer(instructions)
+        for number in cmd.groups()
     ))
 
 
-CRANE_FUNCTIONAL = dict(
-    CrateMover9000=move_crates_one_at_time,
-    CrateMover9001=move_crates_multiply_at_time
-)
+def rearrange_manifest(path, crane_type=DEFAULT_CRANE_TYPE):
+    yard = CrateYard(crane_type)
+    with open(path) as file:
+        yard.read_stacks(file)
+        yard.rearrange(file.read())
+
+    return ''.join(yard.get_top_crates())
+
+
+def rearrange_manifests(paths, crane_type=DEFAULT_CRANE_TYPE, workers=None):
+    paths = list(paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        top_crates = executor.map(rearrange_manifest, paths, [crane_type] * len(paths))
+
+        return dict(zip(paths, top_crates))
+
 
 if __name__ == '__main__':
-    crane_type = 'CrateMover9001'
-    stacks: List[List[str]] = []
+    yard = CrateYard('CrateMover9001')
     with open('inputs/5_supply_stacks.txt') as file:
-        line = file.readline()
-        while STACK_CRATES_PATT.search(line):
-            parse_crates(line)
-            line = file.readline()
+        yard.read_stacks(file)
+        commands = compile_commands(file.read())
 
-        for cmd in file:
-            if COMMAND_PATT.search(cmd):
-                complete_rearrange_command(cmd)
-                print_stacks()
-                print(cmd)
+    yard.run_commands(commands, render=RENDER_STEPS)
 
-    top_crates = get_top_crates()
+    top_crates = yard.get_top_crates()
 
-    print('Rearranged stacks\n'.center(len(stacks) * 4 - 1, ' '))
-    print_stacks()
+    print('Rearranged stacks\n'.center(len(yard.stacks) * 4 - 1, ' '))
+    yard.print_stacks()
     print(f'Top crates sequence is {"".join(top_crates)}')
 
 
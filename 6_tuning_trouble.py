@@ -1,17 +1,113 @@
+import asyncio
+import os
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
 PACKET_MARKER_LEN = 4
 MESSAGE_MARKER_LEN = 14
+CHUNK_SIZE = 64 * 1024
+STREAMS_BATCH_SIZE = 1000
 
 
-def find_stream_marker(stream, marker_len):
-    pointer = marker_len
-    while pointer <= len(stream):
-        marker = stream[pointer - marker_len:pointer]
-        if len(set(marker)) == marker_len:
-            return marker, pointer
+class DistinctWindow:
+
+    def __init__(self):
+        self.last_seen = dict()
+        self.start = 0
+        self.end = 0
+
+    def push(self, symbol):
+        seen_at = self.last_seen.get(symbol, -1)
+        if seen_at >= self.start:
+            self.start = seen_at + 1
+
+        self.last_seen[symbol] = self.end
+        self.end += 1
+
+        return self.end - self.start
+
+
+class StreamMarkerDetector:
+
+    def __init__(self, marker_lengths):
+        self.pending = sorted(set(marker_lengths))
+        self.markers = dict()
+        self.window = DistinctWindow()
+        self.offset = 0
+        self.tail = None
+        self.empty_marker = ''
+
+    def is_complete(self):
+        return not self.pending
+
+    def get_markers(self):
+        markers = dict(self.markers)
+        for marker_len in self.pending:
+            markers[marker_len] = (self.empty_marker, 0)
+
+        return markers
+
+    def feed(self, chunk):
+        found = []
+        if not self.pending:
+            return found
+
+        self.empty_marker = chunk[:0]
+        buffer = chunk if self.tail is None else self.tail + chunk
+        buffer_offset = self.offset - (len(buffer) - len(chunk))
+
+        pending = self.pending
+        push = self.window.push
+        for pos, symbol in enumerate(chunk, start=self.offset + 1):
+            window_len = push(symbol)
+            while pending and pending[0] <= window_len:
+                marker_len = pending.pop(0)
+                end = pos - buffer_offset
+                marker = (buffer[end - marker_len:end], pos)
+                self.markers[marker_len] = marker
+                found.append((marker_len, marker))
+
+            if not pending:
+                break
+
+        self.offset += len(chunk)
+        if pending:
+            keep = min(pending[-1] - 1, len(buffer))
+            self.tail = buffer[len(buffer) - keep:]
+
+        return found
+
+
+def find_stream_markers(stream, marker_lengths):
+    detector = StreamMarkerDetector(marker_lengths)
+    detector.feed(stream)
 
-        pointer += 1
+    return detector.get_markers()
 
-    return '', 0
+
+async def detect_stream_markers(reader: asyncio.StreamReader, marker_lengths, chunk_size=CHUNK_SIZE):
+    detector = StreamMarkerDetector(marker_lengths)
+    while not detector.is_complete():
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            break
+
+        for marker_len, marker in detector.feed(chunk):
+            yield marker_len, marker
+
+
+async def open_pipe_reader(pipe):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+
+    return reader
+
+
+def find_stream_marker(stream, marker_len):
+    return find_stream_markers(stream, (marker_len,))[marker_len]
 
 
 def find_message_start_marker(stream):
@@ -22,11 +118,61 @@ def find_packet_start_marker(stream):
     return find_stream_marker(stream, PACKET_MARKER_LEN)
 
 
+def iter_stream_markers(stream, marker_len):
+    window = DistinctWindow()
+    for symbol in stream:
+        if window.push(symbol) >= marker_len:
+            yield window.end
+
+
+def scan_streams_batch(streams, first_idx, marker_len):
+    results = array('I')
+    for stream_idx, stream in enumerate(streams, start=first_idx):
+        offsets = array('I', iter_stream_markers(stream.strip(), marker_len))
+        results.extend((stream_idx, len(offsets)))
+        results.extend(offsets)
+
+    return results.tobytes()
+
+
+def scan_streams_file(streams_path, results_path, marker_len, batch_size=STREAMS_BATCH_SIZE, workers=None):
+    workers = workers or os.cpu_count()
+    with open(streams_path) as streams, open(results_path, 'wb') as results, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        first_idx = 0
+        batch = list(islice(streams, batch_size))
+        while batch:
+            pending.append(executor.submit(scan_streams_batch, batch, first_idx, marker_len))
+            if len(pending) >= workers * 2:
+                results.write(pending.popleft().result())
+
+            first_idx += len(batch)
+            batch = list(islice(streams, batch_size))
+
+        for future in pending:
+            results.write(future.result())
+
+
+def read_streams_markers(results_path):
+    results = array('I')
+    with open(results_path, 'rb') as file:
+        results.frombytes(file.read())
+
+    pos = 0
+    while pos < len(results):
+        stream_idx, count = results[pos], results[pos + 1]
+        pos += 2
+        yield stream_idx, results[pos:pos + count]
+        pos += count
+
+
 if __name__ == '__main__':
     with open('inputs/6_datastream_buffer.txt') as file:
         stream = file.read().strip()
-        packet_marker, packer_marker_pos = find_packet_start_marker(stream)
-        message_marker, message_marker_pos = find_message_start_marker(stream)
+        markers = find_stream_markers(stream, (PACKET_MARKER_LEN, MESSAGE_MARKER_LEN))
+        packet_marker, packer_marker_pos = markers[PACKET_MARKER_LEN]
+        message_marker, message_marker_pos = markers[MESSAGE_MARKER_LEN]
 
         if packet_marker and packer_marker_pos:
             print(f'The packet start marker is |{packet_marker}| in the position {packer_marker_pos}')
@@ -1,8 +1,13 @@
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
 from typing import IO
 
 
 TOTAL_DISK_SPACE = 70000000
 REQUIRED_UNUSED_SPACE = 30000000
+FILESYSTEM_BACKEND = 'objects'  # ('objects', 'compact')
+NO_PARENT = -1
 
 
 class FileSystem:
@@ -10,8 +15,29 @@ class FileSystem:
     def __init__(self):
         self.root = Directory('/', root=True)
 
+    def get_directory(self, path):
+        directory = self.root
+        for name in path.strip('/').split('/'):
+            if name:
+                directory = directory.get_child(name)
+
+        return directory
+
+    def add_file(self, path, size):
+        dir_path, _, name = path.rpartition('/')
+        self.get_directory(dir_path).add_child(File(name, size))
+
+    def remove_file(self, path):
+        dir_path, _, name = path.rpartition('/')
+        self.get_directory(dir_path).remove_child(name)
+
+    def resize_file(self, path, size):
+        dir_path, _, name = path.rpartition('/')
+        self.get_directory(dir_path).resize_file(name, size)
+
 
 class Directory:
+    __slots__ = ('root', 'name', 'parent', 'children', 'size')
 
     def __init__(self, name, parent_dir=None, root=False):
         self.root = root
@@ -30,109 +56,454 @@ class Directory:
     def get_children(self):
         return self.children.values()
 
-    def add_child(self, child):
+    def add_child(self, child, propagate=True):
+        replaced = self.children.get(child.name)
         self.children[child.name] = child
 
+        delta = child.size - (replaced.size if replaced else 0)
+        if propagate:
+            self.propagate_size(delta)
+        else:
+            self.size += delta
+
+        return delta
+
+    def remove_child(self, child_name):
+        child = self.children.pop(child_name)
+        self.propagate_size(-child.size)
+
+        return child
+
+    def resize_file(self, file_name, size):
+        file = self.children[file_name]
+        delta = size - file.size
+        file.size = size
+        self.propagate_size(delta)
+
+    def propagate_size(self, delta):
+        if not delta:
+            return
+
+        directory = self
+        while directory is not None:
+            directory.size += delta
+            directory = directory.parent
+
     def has_child(self, child_name):
         return self.children.get(child_name)
 
     def is_root(self):
         return self.root
 
+    def is_directory(self):
+        return True
+
 
 class File:
+    __slots__ = ('name', 'size')
 
     def __init__(self, name, size):
         self.name = name
         self.size = size
 
+    def is_directory(self):
+        return False
+
 
 def parse_filesystem_tree(stream: IO):
     ls = 'ls'
     cd_out = '..'
+    cd_root = '/'
 
     def is_cmd(out: str): return out.startswith('$')
 
+    def leave_directory(directory: Directory):
+        delta = pending_sizes.pop()
+        parent = directory.get_parent()
+        parent.size += delta
+        pending_sizes[-1] += delta
+
+        return parent
+
     fs = FileSystem()
     cwd = fs.root
+    pending_sizes = [0]
     for output in stream:
         output = output.strip()
+        if not output:
+            continue
+
         if is_cmd(output):
             if output == ls: continue
 
             param = output.split()[-1]
-            if param == cd_out and not cwd.is_root():
-                cwd = cwd.get_parent()
-            elif cwd.has_child(param):
+            if param == cd_root:
+                while not cwd.is_root():
+                    cwd = leave_directory(cwd)
+            elif param == cd_out:
+                if not cwd.is_root():
+                    cwd = leave_directory(cwd)
+            elif cwd.has_child(param) and cwd.get_child(param).is_directory():
                 cwd = cwd.get_child(param)
+                pending_sizes.append(0)
 
         else:
             prefix, name = output.split()
+            if cwd.has_child(name):
+                continue
+
             if prefix == 'dir':
                 child = Directory(name, cwd)
             else:
                 bytes_ = int(prefix)
                 child = File(name, bytes_)
 
-            cwd.add_child(child)
+            pending_sizes[-1] += cwd.add_child(child, propagate=False)
+
+    while not cwd.is_root():
+        cwd = leave_directory(cwd)
 
     return fs
 
 
-def calculate_directories_size(directory: Directory):
-    size = 0
+class CompactFileSystem:
+
+    def __init__(self):
+        self.parents = array('q')
+        self.sizes = array('q')
+        self.is_dir = bytearray()
+        self.names = bytearray()
+        self.name_offsets = array('Q', [0])
+        self.child_offsets = array('Q', [0, 0])
+        self.children = array('q')
+
+        self.extra_children = dict()
+        self.name_lookups = dict()
+        self.pending_changes = 0
+
+        self.add_node('/', NO_PARENT, is_dir=True)
+        self.root = DirectoryView(self, 0)
+
+    def add_node(self, name, parent, size=0, is_dir=False):
+        self.parents.append(parent)
+        self.sizes.append(size)
+        self.is_dir.append(is_dir)
+        self.names += name.encode()
+        self.name_offsets.append(len(self.names))
+
+        return len(self.parents) - 1
+
+    def get_name(self, idx):
+        return self.names[self.name_offsets[idx]:self.name_offsets[idx + 1]].decode()
+
+    def get_children(self, idx):
+        children = self.children[self.child_offsets[idx]:self.child_offsets[idx + 1]]
+        if not self.pending_changes:
+            return children
+
+        children.extend(self.extra_children.get(idx, ()))
+        return [child for child in children if self.parents[child] == idx]
+
+    def find_child(self, idx, child_name):
+        lookup = self.name_lookups.get(idx)
+        if lookup is None:
+            lookup = self.name_lookups[idx] = {self.get_name(child): child for child in self.get_children(idx)}
+
+        return lookup.get(child_name)
+
+    def get_node(self, idx):
+        return DirectoryView(self, idx) if self.is_dir[idx] else FileView(self, idx)
+
+    def get_directory(self, path):
+        directory = self.root
+        for name in path.strip('/').split('/'):
+            if name:
+                directory = directory.get_child(name)
+
+        return directory
+
+    def get_file_idx(self, path):
+        dir_path, _, name = path.rpartition('/')
+        idx = self.find_child(self.get_directory(dir_path).idx, name)
+        if idx is None:
+            raise KeyError(name)
+
+        return idx
+
+    def add_file(self, path, size):
+        dir_path, _, name = path.rpartition('/')
+        directory = self.get_directory(dir_path).idx
+        if self.find_child(directory, name) is not None:
+            self.resize_file(path, size)
+            return
+
+        idx = self.add_node(name, directory, size=size)
+        self.extra_children.setdefault(directory, array('q')).append(idx)
+        self.name_lookups[directory][name] = idx
+        self.propagate_size(directory, size)
+        self.register_change()
+
+    def remove_file(self, path):
+        idx = self.get_file_idx(path)
+        directory = self.parents[idx]
+
+        del self.name_lookups[directory][self.get_name(idx)]
+        self.propagate_size(directory, -self.sizes[idx])
+        self.parents[idx] = NO_PARENT
+        self.sizes[idx] = 0
+        self.register_change()
+
+    def resize_file(self, path, size):
+        idx = self.get_file_idx(path)
+        delta = size - self.sizes[idx]
+        self.sizes[idx] = size
+        self.propagate_size(self.parents[idx], delta)
+
+    def propagate_size(self, idx, delta):
+        if not delta:
+            return
+
+        while idx != NO_PARENT:
+            self.sizes[idx] += delta
+            idx = self.parents[idx]
+
+    def register_change(self):
+        self.pending_changes += 1
+        if self.pending_changes > len(self.children):
+            self.build_children_index()
+
+    def complete_tree(self):
+        nodes_count = len(self.parents)
+        parents = self.parents
+        sizes = self.sizes
+        for idx in range(nodes_count - 1, 0, -1):
+            sizes[parents[idx]] += sizes[idx]
+
+        self.build_children_index()
+
+    def build_children_index(self):
+        nodes_count = len(self.parents)
+        parents = self.parents
+
+        children_count = array('Q', bytes(8 * (nodes_count + 1)))
+        for idx in range(1, nodes_count):
+            if parents[idx] != NO_PARENT:
+                children_count[parents[idx] + 1] += 1
+
+        self.child_offsets = array('Q', accumulate(children_count))
+        self.children = array('q', bytes(8 * self.child_offsets[-1]))
+        next_slot = array('Q', self.child_offsets[:-1])
+        for idx in range(1, nodes_count):
+            parent = parents[idx]
+            if parent != NO_PARENT:
+                self.children[next_slot[parent]] = idx
+                next_slot[parent] += 1
+
+        self.extra_children.clear()
+        self.pending_changes = 0
+
+
+class DirectoryView:
+    __slots__ = ('storage', 'idx')
+
+    def __init__(self, storage: CompactFileSystem, idx):
+        self.storage = storage
+        self.idx = idx
+
+    def __eq__(self, other):
+        return isinstance(other, DirectoryView) and (self.storage, self.idx) == (other.storage, other.idx)
+
+    def __hash__(self):
+        return hash(self.idx)
+
+    @property
+    def name(self):
+        return self.storage.get_name(self.idx)
+
+    @property
+    def size(self):
+        return self.storage.sizes[self.idx]
+
+    @size.setter
+    def size(self, size):
+        self.storage.sizes[self.idx] = size
+
+    @property
+    def parent(self):
+        parent = self.storage.parents[self.idx]
+        return DirectoryView(self.storage, parent) if parent != NO_PARENT else None
+
+    def get_child(self, child_name):
+        child = self.has_child(child_name)
+        if child is None:
+            raise KeyError(child_name)
+
+        return child
+
+    def get_children(self):
+        return [self.storage.get_node(idx) for idx in self.storage.get_children(self.idx)]
+
+    def has_child(self, child_name):
+        idx = self.storage.find_child(self.idx, child_name)
+        return self.storage.get_node(idx) if idx is not None else None
+
+    def is_root(self):
+        return self.idx == 0
+
+    def is_directory(self):
+        return True
+
+
+class FileView:
+    __slots__ = ('storage', 'idx')
+
+    def __init__(self, storage: CompactFileSystem, idx):
+        self.storage = storage
+        self.idx = idx
+
+    @property
+    def name(self):
+        return self.storage.get_name(self.idx)
+
+    @property
+    def size(self):
+        return self.storage.sizes[self.idx]
+
+    @size.setter
+    def size(self, size):
+        self.storage.sizes[self.idx] = size
+
+    def is_directory(self):
+        return False
+
+
+def parse_compact_filesystem_tree(stream: IO):
+    cd_out = '..'
+    cd_root = '/'
+
+    fs = CompactFileSystem()
+    directories = dict()
+    listings = dict()
+    cwd = 0
+    listing = None
+    listed_names = None
+    for output in stream:
+        output = output.strip()
+        if not output:
+            continue
+
+        if output.startswith('$'):
+            cmd = output.split()
+            if cmd[1] == 'ls':
+                ranges = listings.setdefault(cwd, [])
+                listed_names = {fs.get_name(idx) for start, end in ranges for idx in range(start, end)}
+                listing = [len(fs.parents), len(fs.parents)]
+                ranges.append(listing)
+                continue
+            elif cmd[-1] == cd_out:
+                cwd = fs.parents[cwd] if cwd else cwd
+            elif cmd[-1] == cd_root:
+                cwd = 0
+            else:
+                cwd = directories.get((cwd, cmd[-1]), cwd)
+
+            listing = None
+            listed_names = None
 
-    for child in directory.get_children():
-        if isinstance(child, Directory):
-            bytes_ = calculate_directories_size(child)
         else:
-            bytes_ = child.size
+            prefix, name = output.split()
+            if listed_names is not None:
+                if name in listed_names:
+                    continue
+
+                listed_names.add(name)
+
+            if prefix == 'dir':
+                if (cwd, name) not in directories:
+                    directories[(cwd, name)] = fs.add_node(name, cwd, is_dir=True)
+            else:
+                fs.add_node(name, cwd, size=int(prefix))
 
-        size += bytes_
+            if listing is not None:
+                listing[1] = len(fs.parents)
 
-    directory.size = size
-    return size
+    fs.complete_tree()
+    return fs
+
+
+def iter_directories(start_dir: Directory):
+    stack = [start_dir]
+    while stack:
+        directory = stack.pop()
+        yield directory
+
+        stack.extend(child for child in reversed(directory.get_children()) if child.is_directory())
+
+
+def calculate_directories_size(directory: Directory):
+    directories = list(iter_directories(directory))
+    for dir_ in reversed(directories):
+        dir_.size = sum(child.size for child in dir_.get_children())
+
+    return directory.size
 
 
 def find_directories_by_size_limit(start_dir, size_limit, greater_than=True):
     directories = []
-    condition_met = start_dir.size >= size_limit if greater_than else start_dir.size < size_limit
+    stack = [start_dir]
+    while stack:
+        directory = stack.pop()
+        condition_met = directory.size >= size_limit if greater_than else directory.size < size_limit
 
-    if condition_met:
-        directories.append(start_dir)
-    elif greater_than:
-        return directories
+        if condition_met:
+            directories.append(directory)
+        elif greater_than:
+            continue
 
-    for child in start_dir.get_children():
-        if isinstance(child, Directory):
-            dirs = find_directories_by_size_limit(child, size_limit, greater_than)
-            directories.extend(dirs)
+        stack.extend(child for child in reversed(directory.get_children()) if child.is_directory())
 
     return directories
 
 
-def define_directory_to_delete():
-    used_space = root.size
+class DirectorySizeIndex:
+
+    def __init__(self, root_dir: Directory):
+        self.root_size = root_dir.size
+        self.directories = sorted(iter_directories(root_dir), key=lambda d: d.size)
+        self.sizes = [d.size for d in self.directories]
+        self.size_sums = [0] + list(accumulate(self.sizes))
+
+    def find_smallest_at_least(self, size):
+        idx = bisect_left(self.sizes, size)
+        if idx < len(self.directories):
+            return self.directories[idx]
+
+        return None
+
+    def sum_sizes_below(self, size_limit):
+        return self.size_sums[bisect_left(self.sizes, size_limit)]
+
+
+def define_directory_to_delete(size_index: DirectorySizeIndex):
+    used_space = size_index.root_size
     space_to_free = used_space - (TOTAL_DISK_SPACE - REQUIRED_UNUSED_SPACE)
 
     if space_to_free > 0:
-        dirs_suitable_for_delete = find_directories_by_size_limit(root, space_to_free)
-        smallest = min(dirs_suitable_for_delete, key=lambda d: d.size)
-
-        return smallest
+        return size_index.find_smallest_at_least(space_to_free)
 
 
 if __name__ == '__main__':
     with open('inputs/7_device_filesystem.txt') as stream:
-        filesystem = parse_filesystem_tree(stream)
+        if FILESYSTEM_BACKEND == 'compact':
+            filesystem = parse_compact_filesystem_tree(stream)
+        else:
+            filesystem = parse_filesystem_tree(stream)
 
     root = filesystem.root
+    size_index = DirectorySizeIndex(root)
 
-    calculate_directories_size(root)
-
-    to_100000_bytes_directories = find_directories_by_size_limit(root, size_limit=100000, greater_than=False)
-    to_100000_bytes_dirs_total_size_sum = sum(d.size for d in to_100000_bytes_directories)
-    dir_to_delete = define_directory_to_delete()
+    to_100000_bytes_dirs_total_size_sum = size_index.sum_sizes_below(100000)
+    dir_to_delete = define_directory_to_delete(size_index)
 
     print(f'Sum of total sizes of directories less than 100000 bytes is {to_100000_bytes_dirs_total_size_sum} bytes')
 